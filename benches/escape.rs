@@ -1,5 +1,5 @@
 use criterion::{black_box, criterion_group, criterion_main, Criterion};
-use rysafe::core::escape;
+use rysafe::core::{escape, escape_bytes, escape_into, escape_with};
 
 fn bench_no_escape(c: &mut Criterion) {
     let text = "This is a simple text without any special characters that need escaping.";
@@ -37,11 +37,55 @@ fn bench_long_text_with_escape(c: &mut Criterion) {
     });
 }
 
+fn bench_markup_without_gt(c: &mut Criterion) {
+    let text = "<li class=\"item\"><a href=\"/x\">Item</a></li>\n".repeat(50);
+    c.bench_function("escape_markup_strict_gt", |b| {
+        b.iter(|| escape_with(black_box(&text), true))
+    });
+    c.bench_function("escape_markup_without_gt", |b| {
+        b.iter(|| escape_with(black_box(&text), false))
+    });
+}
+
+fn bench_short_strings(c: &mut Criterion) {
+    let items = ["id", "42", "<b>", "user name", "a&b", "it's"];
+    c.bench_function("escape_short_strings", |b| {
+        b.iter(|| {
+            for item in items {
+                black_box(escape(black_box(item)));
+            }
+        })
+    });
+}
+
 fn bench_unicode(c: &mut Criterion) {
     let text = "Hello 世界 <script>alert('XSS')</script> & more 日本語";
     c.bench_function("escape_unicode", |b| b.iter(|| escape(black_box(text))));
 }
 
+fn bench_bytes_with_escape(c: &mut Criterion) {
+    let base = "Lorem <ipsum> dolor & sit \"amet\", consectetur adipiscing elit. ";
+    let data = base.repeat(50).into_bytes();
+    c.bench_function("escape_bytes_long_with_special", |b| {
+        b.iter(|| escape_bytes(black_box(&data)))
+    });
+}
+
+fn bench_batch_into(c: &mut Criterion) {
+    let items: Vec<String> = (0..100)
+        .map(|i| format!("user-{} <b>{}</b> & co", i, i * 7))
+        .collect();
+    let mut out = String::new();
+    c.bench_function("escape_into_batch_reused_buffer", |b| {
+        b.iter(|| {
+            out.clear();
+            for item in &items {
+                escape_into(black_box(item), &mut out);
+            }
+        })
+    });
+}
+
 criterion_group!(
     benches,
     bench_no_escape,
@@ -49,6 +93,10 @@ criterion_group!(
     bench_mixed_content,
     bench_long_text_no_escape,
     bench_long_text_with_escape,
-    bench_unicode
+    bench_markup_without_gt,
+    bench_short_strings,
+    bench_unicode,
+    bench_bytes_with_escape,
+    bench_batch_into
 );
 criterion_main!(benches);
@@ -1,5 +1,7 @@
 use std::borrow::Cow;
 
+mod scan;
+
 const ESCAPED_CHARS: [(char, &str); 5] = [
     ('&', "&amp;"),
     ('<', "&lt;"),
@@ -8,39 +10,229 @@ const ESCAPED_CHARS: [(char, &str); 5] = [
     ('\'', "&#39;"),
 ];
 
+const POOL_LEN: usize = pool_len();
+
+/// Replacement lookup split into parallel arrays.
+///
+/// Per-byte lengths and offsets are one byte each and the replacements share
+/// one contiguous pool, so the whole table is about half a kilobyte instead
+/// of 256 fat `&str` pointers.
+struct EscapeTable {
+    len: [u8; 256],
+    offset: [u8; 256],
+    pool: [u8; POOL_LEN],
+}
+
+impl EscapeTable {
+    #[inline]
+    fn get(&self, b: u8) -> &[u8] {
+        let start = self.offset[b as usize] as usize;
+        &self.pool[start..start + self.len[b as usize] as usize]
+    }
+}
+
+static ESCAPE_TABLE: EscapeTable = build_escape_table();
+
+const fn pool_len() -> usize {
+    let mut total = 0;
+    let mut i = 0;
+    while i < ESCAPED_CHARS.len() {
+        total += ESCAPED_CHARS[i].1.len();
+        i += 1;
+    }
+    total
+}
+
+const fn build_escape_table() -> EscapeTable {
+    let mut table = EscapeTable {
+        len: [0; 256],
+        offset: [0; 256],
+        pool: [0; POOL_LEN],
+    };
+    let mut start = 0;
+    let mut i = 0;
+    while i < ESCAPED_CHARS.len() {
+        let (ch, replacement) = ESCAPED_CHARS[i];
+        let replacement = replacement.as_bytes();
+        let mut j = 0;
+        while j < replacement.len() {
+            table.pool[start + j] = replacement[j];
+            j += 1;
+        }
+        table.len[ch as usize] = replacement.len() as u8;
+        table.offset[ch as usize] = start as u8;
+        start += replacement.len();
+        i += 1;
+    }
+    table
+}
+
 pub fn escape(text: &str) -> Cow<str> {
-    let mut escaped = None;
-    let mut last_end = 0;
+    escape_with(text, true)
+}
+
+/// Like [`escape`], but `>` is left as is unless `strict_gt` is set.
+///
+/// `>` needs no escaping in HTML text content or quoted attribute values.
+/// On tag-heavy input it is a large share of all hits, and every hit ends a
+/// vector block early, so leaving it out keeps the scan in its fast loop
+/// for longer.
+pub fn escape_with(text: &str, strict_gt: bool) -> Cow<'_, str> {
+    match escape_bytes_with(text.as_bytes(), strict_gt) {
+        Cow::Borrowed(_) => Cow::Borrowed(text),
+        // SAFETY: only ASCII bytes are replaced, and only with ASCII, so the
+        // output is valid UTF-8 because the input was.
+        Cow::Owned(escaped) => Cow::Owned(unsafe { String::from_utf8_unchecked(escaped) }),
+    }
+}
+
+pub fn escape_bytes(bytes: &[u8]) -> Cow<'_, [u8]> {
+    escape_bytes_with(bytes, true)
+}
+
+/// Byte-level [`escape_with`].
+pub fn escape_bytes_with(bytes: &[u8], strict_gt: bool) -> Cow<'_, [u8]> {
+    if strict_gt {
+        escape_bytes_in::<true>(bytes)
+    } else {
+        escape_bytes_in::<false>(bytes)
+    }
+}
 
-    for (i, ch) in text.char_indices() {
-        let replacement = match ch {
-            '&' => "&amp;",
-            '<' => "&lt;",
-            '>' => "&gt;",
-            '"' => "&#34;",
-            '\'' => "&#39;",
-            _ => continue,
-        };
-
-        if escaped.is_none() {
-            let mut s = String::with_capacity(text.len() + 10);
-            escaped = Some(s);
+fn escape_bytes_in<const GT: bool>(bytes: &[u8]) -> Cow<'_, [u8]> {
+    match scan::find::<GT>(bytes) {
+        Some(first) => {
+            let mut escaped = Vec::new();
+            write_escaped::<GT>(bytes, first, &mut escaped);
+            Cow::Owned(escaped)
         }
+        None => Cow::Borrowed(bytes),
+    }
+}
+
+/// Appends the escaped form of `text` to `out`.
+///
+/// Unlike [`escape`], this never allocates a result of its own, so one buffer
+/// can be reused across many calls, e.g. when escaping a batch of values.
+pub fn escape_into(text: &str, out: &mut String) {
+    escape_into_with(text, out, true);
+}
 
-        if let Some(ref mut s) = escaped {
-            s.push_str(&text[last_end..i]);
-            s.push_str(replacement);
-            last_end = i + ch.len_utf8();
+/// [`escape_into`] with the `strict_gt` choice of [`escape_with`].
+pub fn escape_into_with(text: &str, out: &mut String, strict_gt: bool) {
+    // SAFETY: see `escape_with`; `out` stays valid UTF-8.
+    escape_bytes_into_with(text.as_bytes(), unsafe { out.as_mut_vec() }, strict_gt);
+}
+
+/// Appends the escaped form of `bytes` to `out`.
+pub fn escape_bytes_into(bytes: &[u8], out: &mut Vec<u8>) {
+    escape_bytes_into_with(bytes, out, true);
+}
+
+/// [`escape_bytes_into`] with the `strict_gt` choice of [`escape_with`].
+pub fn escape_bytes_into_with(bytes: &[u8], out: &mut Vec<u8>, strict_gt: bool) {
+    if strict_gt {
+        escape_bytes_into_in::<true>(bytes, out);
+    } else {
+        escape_bytes_into_in::<false>(bytes, out);
+    }
+}
+
+fn escape_bytes_into_in<const GT: bool>(bytes: &[u8], out: &mut Vec<u8>) {
+    if !escape_bytes_into_if_needed_in::<GT>(bytes, out) {
+        out.extend_from_slice(bytes);
+    }
+}
+
+/// Like [`escape_into`], but when nothing needs escaping `out` is left
+/// untouched and `false` is returned.
+///
+/// The caller can then use `text` itself, without copying it and without a
+/// separate [`needs_escaping`] pass over the same bytes.
+pub fn escape_into_if_needed(text: &str, out: &mut String) -> bool {
+    escape_into_if_needed_with(text, out, true)
+}
+
+/// [`escape_into_if_needed`] with the `strict_gt` choice of [`escape_with`].
+pub fn escape_into_if_needed_with(text: &str, out: &mut String, strict_gt: bool) -> bool {
+    // SAFETY: see `escape_with`; `out` stays valid UTF-8.
+    let out = unsafe { out.as_mut_vec() };
+    if strict_gt {
+        escape_bytes_into_if_needed_in::<true>(text.as_bytes(), out)
+    } else {
+        escape_bytes_into_if_needed_in::<false>(text.as_bytes(), out)
+    }
+}
+
+fn escape_bytes_into_if_needed_in<const GT: bool>(bytes: &[u8], out: &mut Vec<u8>) -> bool {
+    match scan::find::<GT>(bytes) {
+        Some(first) => {
+            write_escaped::<GT>(bytes, first, out);
+            true
         }
+        None => false,
     }
+}
+
+fn write_escaped<const GT: bool>(bytes: &[u8], first: usize, out: &mut Vec<u8>) {
+    // Everything before `first` is copied verbatim; leave room for about one
+    // escape per five bytes after it so typical markup never reallocates.
+    out.reserve(bytes.len() + (bytes.len() - first) / 5 + 8);
+
+    let mut pos = first;
+    let mut last_end = 0;
+
+    loop {
+        out.extend_from_slice(&bytes[last_end..pos]);
+        out.extend_from_slice(ESCAPE_TABLE.get(bytes[pos]));
+        last_end = pos + 1;
 
-    match escaped {
-        Some(mut s) => {
-            s.push_str(&text[last_end..]);
-            Cow::Owned(s)
+        match scan::find::<GT>(&bytes[last_end..]) {
+            Some(i) => pos = last_end + i,
+            None => break,
         }
-        None => Cow::Borrowed(text),
     }
+
+    out.extend_from_slice(&bytes[last_end..]);
+}
+
+/// Escapes as much of `bytes` as fits into `out`.
+///
+/// Returns `(read, written)`: the first `read` input bytes were escaped into
+/// `out[..written]`. A replacement is never split, so `read < bytes.len()`
+/// means `out` ran out of room; continue with `bytes[read..]` into fresh
+/// space. This lets callers write into memory they do not own as a `Vec`.
+pub fn escape_bytes_to_slice(bytes: &[u8], out: &mut [u8]) -> (usize, usize) {
+    let (mut read, mut written) = (0, 0);
+    loop {
+        let rest = &bytes[read..];
+        let run = scan::find::<true>(rest).unwrap_or(rest.len());
+        let n = run.min(out.len() - written);
+        out[written..written + n].copy_from_slice(&rest[..n]);
+        read += n;
+        written += n;
+        if n < run || read == bytes.len() {
+            return (read, written);
+        }
+
+        let replacement = ESCAPE_TABLE.get(bytes[read]);
+        if replacement.len() > out.len() - written {
+            return (read, written);
+        }
+        out[written..written + replacement.len()].copy_from_slice(replacement);
+        read += 1;
+        written += replacement.len();
+    }
+}
+
+/// Name of the scan kernel picked for this CPU, e.g. `"avx2"`; for bug
+/// reports and diagnostics.
+pub fn scan_kernel() -> &'static str {
+    scan::kernel_name()
+}
+
+pub fn needs_escaping(text: &str) -> bool {
+    scan::find::<true>(text.as_bytes()).is_some()
 }
 
 pub fn escape_silent(text: Option<&str>) -> Cow<str> {
@@ -66,6 +258,26 @@ mod tests {
         assert_eq!(escape("&<>\"'"), "&amp;&lt;&gt;&#34;&#39;");
     }
 
+    #[test]
+    fn test_escape_table() {
+        for b in 0..=255u8 {
+            let expected = match ESCAPED_CHARS.iter().find(|(ch, _)| *ch as u32 == b as u32) {
+                Some((_, replacement)) => replacement,
+                None => "",
+            };
+            assert_eq!(ESCAPE_TABLE.get(b), expected.as_bytes());
+            assert_eq!(!expected.is_empty(), scan::is_special::<true>(b));
+        }
+    }
+
+    #[test]
+    fn test_escape_table_layout() {
+        // The whole table must stay within a handful of cache lines.
+        assert_eq!(POOL_LEN, 23);
+        assert_eq!(std::mem::size_of::<EscapeTable>(), 256 + 256 + POOL_LEN);
+        assert_eq!(&ESCAPE_TABLE.pool, b"&amp;&lt;&gt;&#34;&#39;");
+    }
+
     #[test]
     fn test_escape_mixed() {
         assert_eq!(
@@ -81,6 +293,118 @@ mod tests {
         assert_eq!(escape_silent(Some("<test>")), "&lt;test&gt;");
     }
 
+    #[test]
+    fn test_no_escape_borrows() {
+        assert!(matches!(escape("plain text"), Cow::Borrowed(_)));
+        assert!(matches!(escape("日本語 text"), Cow::Borrowed(_)));
+        assert!(matches!(escape("a < b"), Cow::Owned(_)));
+    }
+
+    #[test]
+    fn test_needs_escaping() {
+        assert!(!needs_escaping(""));
+        assert!(!needs_escaping("plain text 世界 with no specials at all"));
+        assert!(needs_escaping(
+            "plain text 世界 with one special at the end'"
+        ));
+        assert!(needs_escaping("&"));
+    }
+
+    #[test]
+    fn test_escape_bytes() {
+        assert_eq!(escape_bytes(b"plain"), &b"plain"[..]);
+        assert_eq!(
+            escape_bytes(b"<a href='x'>"),
+            &b"&lt;a href=&#39;x&#39;&gt;"[..]
+        );
+        assert_eq!(escape_bytes(b"\xff<\xfe"), &b"\xff&lt;\xfe"[..]);
+        assert!(matches!(escape_bytes(b"plain"), Cow::Borrowed(_)));
+    }
+
+    #[test]
+    fn test_escape_sparse_input_does_not_reallocate() {
+        let text = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, \
+                    sed do eiusmod <i>tempor</i> incididunt & labore. "
+            .repeat(20);
+        let first = text.find('<').unwrap();
+        let reserved = text.len() + (text.len() - first) / 5 + 8;
+        // Reserving the same amount up front makes the reserve inside
+        // `write_escaped` a no-op, so any growth after it shows up as a
+        // changed capacity or a moved buffer.
+        let mut out = String::new();
+        out.reserve(reserved);
+        let (capacity, ptr) = (out.capacity(), out.as_ptr());
+        escape_into(&text, &mut out);
+        assert!(out.len() > text.len());
+        assert_eq!(out.capacity(), capacity);
+        assert_eq!(out.as_ptr(), ptr);
+    }
+
+    #[test]
+    fn test_escape_into_appends() {
+        let mut out = String::new();
+        for item in ["<a>", "plain", "世界 & co", ""] {
+            escape_into(item, &mut out);
+            out.push('|');
+        }
+        assert_eq!(out, "&lt;a&gt;|plain|世界 &amp; co||");
+
+        let mut buf = b"prefix:".to_vec();
+        escape_bytes_into(b"\"q\"", &mut buf);
+        assert_eq!(buf, b"prefix:&#34;q&#34;");
+    }
+
+    #[test]
+    fn test_escape_without_gt() {
+        assert_eq!(
+            escape_with("<a href='x'>b</a>", false),
+            "&lt;a href=&#39;x&#39;>b&lt;/a>"
+        );
+        assert_eq!(escape_with("a -> b & c", false), "a -> b &amp; c");
+        assert!(matches!(escape_with("a > b", false), Cow::Borrowed(_)));
+        assert_eq!(escape_with("a > b", true), "a &gt; b");
+
+        let mut out = String::new();
+        escape_into_with("<p>x</p>", &mut out, false);
+        assert_eq!(out, "&lt;p>x&lt;/p>");
+        assert_eq!(escape_bytes_with(b"\xff>\"", false), &b"\xff>&#34;"[..]);
+    }
+
+    #[test]
+    fn test_escape_into_if_needed() {
+        let mut out = String::from("kept:");
+        assert!(!escape_into_if_needed("plain 世界", &mut out));
+        assert!(!escape_into_if_needed_with("a > b", &mut out, false));
+        assert_eq!(out, "kept:");
+        assert!(escape_into_if_needed("a > b", &mut out));
+        assert!(escape_into_if_needed_with("<x>", &mut out, false));
+        assert_eq!(out, "kept:a &gt; b&lt;x>");
+    }
+
+    #[test]
+    fn test_escape_bytes_to_slice() {
+        let input = "a<b>&'\"c 世界 <i>x</i>".as_bytes();
+        let expected = escape_bytes(input);
+        for size in 1..=expected.len() + 2 {
+            let mut out = Vec::new();
+            let mut buf = vec![0u8; size];
+            let mut read = 0;
+            while read < input.len() {
+                let (r, w) = escape_bytes_to_slice(&input[read..], &mut buf);
+                assert!(r > 0 || size < 5, "no progress with {} bytes", size);
+                if r == 0 && w == 0 {
+                    buf.resize(buf.len() * 2, 0);
+                    continue;
+                }
+                out.extend_from_slice(&buf[..w]);
+                read += r;
+            }
+            assert_eq!(out, &*expected, "buffer of {} bytes", size);
+        }
+        assert_eq!(escape_bytes_to_slice(b"", &mut []), (0, 0));
+        assert_eq!(escape_bytes_to_slice(b"<", &mut [0; 3]), (0, 0));
+    }
+
     #[test]
     fn test_unicode() {
         assert_eq!(escape("Hello 世界 <test>"), "Hello 世界 &lt;test&gt;");
@@ -0,0 +1,369 @@
+//! Locating the next byte that needs escaping.
+//!
+//! Every escaped character is ASCII, so the search runs over raw bytes and
+//! any offset it returns is a valid `char` boundary.
+//!
+//! Each finder takes a `GT` parameter saying whether `>` is part of the set.
+//! Leaving it out is a separate instantiation rather than a runtime flag, so
+//! the default set pays nothing for the option.
+
+/// Returns the index of the first `&`, `<`, `"` or `'` in `bytes`, or of
+/// `>` as well when `GT` is set.
+#[inline]
+pub fn find<const GT: bool>(bytes: &[u8]) -> Option<usize> {
+    #[cfg(target_arch = "x86_64")]
+    {
+        x86::find::<GT>(bytes)
+    }
+    #[cfg(not(target_arch = "x86_64"))]
+    {
+        find_swar::<GT>(bytes)
+    }
+}
+
+/// Name of the kernel `find` uses for inputs of at least one vector on this
+/// CPU; shorter inputs always take the SWAR path.
+pub fn kernel_name() -> &'static str {
+    #[cfg(target_arch = "x86_64")]
+    {
+        x86::kernel_name()
+    }
+    #[cfg(not(target_arch = "x86_64"))]
+    {
+        "swar"
+    }
+}
+
+#[inline]
+pub fn is_special<const GT: bool>(b: u8) -> bool {
+    matches!(b, b'&' | b'<' | b'"' | b'\'') || (GT && b == b'>')
+}
+
+const LO: u64 = 0x0101_0101_0101_0101;
+const HI: u64 = 0x8080_8080_8080_8080;
+
+/// Sets the high bit of every byte in `word` that equals `b`.
+///
+/// Bytes above the first match may be flagged spuriously by the borrow, so
+/// only the lowest set bit is meaningful.
+#[inline]
+fn match_byte(word: u64, b: u8) -> u64 {
+    let x = word ^ (LO * b as u64);
+    x.wrapping_sub(LO) & !x & HI
+}
+
+/// Portable search testing eight bytes per step within a `u64`.
+fn find_swar<const GT: bool>(bytes: &[u8]) -> Option<usize> {
+    let mut chunks = bytes.chunks_exact(8);
+    let mut i = 0;
+
+    for chunk in &mut chunks {
+        let word = u64::from_le_bytes(chunk.try_into().unwrap());
+        let mut hits = match_byte(word, b'&')
+            | match_byte(word, b'<')
+            | match_byte(word, b'"')
+            | match_byte(word, b'\'');
+        if GT {
+            hits |= match_byte(word, b'>');
+        }
+        if hits != 0 {
+            return Some(i + (hits.trailing_zeros() / 8) as usize);
+        }
+        i += 8;
+    }
+
+    chunks
+        .remainder()
+        .iter()
+        .position(|&b| is_special::<GT>(b))
+        .map(|j| i + j)
+}
+
+#[cfg(target_arch = "x86_64")]
+mod sse2 {
+    use std::arch::x86_64::*;
+
+    const LANES: usize = 16;
+
+    pub fn find<const GT: bool>(bytes: &[u8]) -> Option<usize> {
+        let mut i = 0;
+
+        // SSE2 is part of the x86_64 baseline, so no runtime check is needed.
+        unsafe {
+            let amp = _mm_set1_epi8(b'&' as i8);
+            let lt = _mm_set1_epi8(b'<' as i8);
+            let gt = _mm_set1_epi8(b'>' as i8);
+            let quot = _mm_set1_epi8(b'"' as i8);
+            let apos = _mm_set1_epi8(b'\'' as i8);
+
+            while i + LANES <= bytes.len() {
+                let v = _mm_loadu_si128(bytes.as_ptr().add(i) as *const __m128i);
+                let mut hits = _mm_or_si128(
+                    _mm_or_si128(_mm_cmpeq_epi8(v, amp), _mm_cmpeq_epi8(v, lt)),
+                    _mm_or_si128(_mm_cmpeq_epi8(v, quot), _mm_cmpeq_epi8(v, apos)),
+                );
+                if GT {
+                    hits = _mm_or_si128(hits, _mm_cmpeq_epi8(v, gt));
+                }
+                let mask = _mm_movemask_epi8(hits);
+                if mask != 0 {
+                    return Some(i + mask.trailing_zeros() as usize);
+                }
+                i += LANES;
+            }
+        }
+
+        super::find_swar::<GT>(&bytes[i..]).map(|j| i + j)
+    }
+}
+
+/// Picks the widest available implementation once, on first use.
+///
+/// Each slot starts out pointing at `detect`, which probes the CPU, stores
+/// the selected implementation and forwards the call. Every later call is a
+/// single indirect jump with no feature checks.
+#[cfg(target_arch = "x86_64")]
+mod x86 {
+    use std::sync::atomic::{AtomicPtr, Ordering};
+
+    type FindFn = fn(&[u8]) -> Option<usize>;
+
+    static FIND: AtomicPtr<()> = AtomicPtr::new(detect::<true> as FindFn as *mut ());
+    static FIND_NO_GT: AtomicPtr<()> = AtomicPtr::new(detect::<false> as FindFn as *mut ());
+
+    #[inline]
+    fn slot<const GT: bool>() -> &'static AtomicPtr<()> {
+        if GT {
+            &FIND
+        } else {
+            &FIND_NO_GT
+        }
+    }
+
+    #[inline]
+    pub fn find<const GT: bool>(bytes: &[u8]) -> Option<usize> {
+        // Below one vector the wide kernels only reach their own SWAR tail,
+        // so skip the indirect call and the table setup.
+        if bytes.len() < 16 {
+            return super::find_swar::<GT>(bytes);
+        }
+        let f = slot::<GT>().load(Ordering::Relaxed);
+        // SAFETY: the slots only ever hold a `FindFn`.
+        unsafe { std::mem::transmute::<*mut (), FindFn>(f)(bytes) }
+    }
+
+    fn select<const GT: bool>() -> (&'static str, FindFn) {
+        if is_x86_feature_detected!("avx2") {
+            ("avx2", find_avx2::<GT>)
+        } else if is_x86_feature_detected!("ssse3") {
+            ("ssse3", find_ssse3::<GT>)
+        } else {
+            ("sse2", super::sse2::find::<GT>)
+        }
+    }
+
+    fn detect<const GT: bool>(bytes: &[u8]) -> Option<usize> {
+        let (_, f) = select::<GT>();
+        slot::<GT>().store(f as *mut (), Ordering::Relaxed);
+        f(bytes)
+    }
+
+    pub fn kernel_name() -> &'static str {
+        select::<true>().0
+    }
+
+    fn find_avx2<const GT: bool>(bytes: &[u8]) -> Option<usize> {
+        // SAFETY: only selected by `detect` after AVX2 was detected.
+        unsafe { super::avx2::find::<GT>(bytes) }
+    }
+
+    fn find_ssse3<const GT: bool>(bytes: &[u8]) -> Option<usize> {
+        // SAFETY: only selected by `detect` after SSSE3 was detected.
+        unsafe { super::ssse3::find::<GT>(bytes) }
+    }
+}
+
+/// Special characters indexed by their low nibble, which is distinct for all
+/// five (`"` 2, `&` 6, `'` 7, `<` C, `>` E).
+///
+/// `pshufb` looks each input byte up by its low nibble and zeroes lanes whose
+/// high bit is set, so comparing the lookup with the input is true exactly
+/// for special bytes. The filler `0xFF` never equals an ASCII input.
+#[cfg(target_arch = "x86_64")]
+const NIBBLE_TABLE: [u8; 16] = [
+    0xFF, 0xFF, b'"', 0xFF, 0xFF, 0xFF, b'&', b'\'', 0xFF, 0xFF, 0xFF, 0xFF, b'<', 0xFF, b'>', 0xFF,
+];
+
+/// `NIBBLE_TABLE` with the `>` entry filled, for when `>` is not escaped.
+#[cfg(target_arch = "x86_64")]
+const NIBBLE_TABLE_NO_GT: [u8; 16] = {
+    let mut table = NIBBLE_TABLE;
+    table[0xE] = 0xFF;
+    table
+};
+
+#[cfg(target_arch = "x86_64")]
+#[inline(always)]
+fn nibble_table<const GT: bool>() -> &'static [u8; 16] {
+    if GT {
+        &NIBBLE_TABLE
+    } else {
+        &NIBBLE_TABLE_NO_GT
+    }
+}
+
+#[cfg(target_arch = "x86_64")]
+mod ssse3 {
+    use std::arch::x86_64::*;
+
+    const LANES: usize = 16;
+
+    #[target_feature(enable = "ssse3")]
+    pub unsafe fn find<const GT: bool>(bytes: &[u8]) -> Option<usize> {
+        let table = _mm_loadu_si128(super::nibble_table::<GT>().as_ptr() as *const __m128i);
+        let mut i = 0;
+
+        while i + LANES <= bytes.len() {
+            let v = _mm_loadu_si128(bytes.as_ptr().add(i) as *const __m128i);
+            let hits = _mm_cmpeq_epi8(_mm_shuffle_epi8(table, v), v);
+            let mask = _mm_movemask_epi8(hits);
+            if mask != 0 {
+                return Some(i + mask.trailing_zeros() as usize);
+            }
+            i += LANES;
+        }
+
+        super::find_swar::<GT>(&bytes[i..]).map(|j| i + j)
+    }
+}
+
+#[cfg(target_arch = "x86_64")]
+mod avx2 {
+    use std::arch::x86_64::*;
+
+    const LANES: usize = 32;
+
+    #[target_feature(enable = "avx2")]
+    pub unsafe fn find<const GT: bool>(bytes: &[u8]) -> Option<usize> {
+        // vpshufb shuffles within each 128-bit lane, so both halves need the table.
+        let table = _mm256_broadcastsi128_si256(_mm_loadu_si128(
+            super::nibble_table::<GT>().as_ptr() as *const __m128i,
+        ));
+        let mut i = 0;
+
+        while i + LANES <= bytes.len() {
+            let v = _mm256_loadu_si256(bytes.as_ptr().add(i) as *const __m256i);
+            let hits = _mm256_cmpeq_epi8(_mm256_shuffle_epi8(table, v), v);
+            let mask = _mm256_movemask_epi8(hits) as u32;
+            if mask != 0 {
+                return Some(i + mask.trailing_zeros() as usize);
+            }
+            i += LANES;
+        }
+
+        super::ssse3::find::<GT>(&bytes[i..]).map(|j| i + j)
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn finders<const GT: bool>() -> Vec<fn(&[u8]) -> Option<usize>> {
+        let mut finders: Vec<fn(&[u8]) -> Option<usize>> = vec![find::<GT>, find_swar::<GT>];
+        #[cfg(target_arch = "x86_64")]
+        {
+            finders.push(sse2::find::<GT>);
+            if is_x86_feature_detected!("ssse3") {
+                finders.push(|b| unsafe { ssse3::find::<GT>(b) });
+            }
+            if is_x86_feature_detected!("avx2") {
+                finders.push(|b| unsafe { avx2::find::<GT>(b) });
+            }
+        }
+        finders
+    }
+
+    fn check_every_offset<const GT: bool>() {
+        for find in finders::<GT>() {
+            for len in 0..70 {
+                let clean = vec![b'a'; len];
+                assert_eq!(find(&clean), None);
+                for pos in 0..len {
+                    for &special in b"&<>\"'" {
+                        let mut buf = clean.clone();
+                        buf[pos] = special;
+                        let hit = if is_special::<GT>(special) {
+                            Some(pos)
+                        } else {
+                            None
+                        };
+                        assert_eq!(find(&buf), hit);
+                        if pos + 1 < len {
+                            buf[pos + 1] = b'<';
+                            assert_eq!(find(&buf), hit.or(Some(pos + 1)));
+                        }
+                    }
+                }
+            }
+        }
+    }
+
+    fn check_every_byte<const GT: bool>() {
+        for find in finders::<GT>() {
+            for b in 0..=255u8 {
+                let buf = [b; 40];
+                let expected = if is_special::<GT>(b) { Some(0) } else { None };
+                assert_eq!(find(&buf), expected, "byte {:#04x}", b);
+            }
+        }
+    }
+
+    #[test]
+    fn test_find_every_offset() {
+        check_every_offset::<true>();
+        check_every_offset::<false>();
+    }
+
+    #[test]
+    fn test_find_classifies_every_byte() {
+        check_every_byte::<true>();
+        check_every_byte::<false>();
+    }
+
+    #[test]
+    fn test_kernel_name() {
+        let name = kernel_name();
+        #[cfg(target_arch = "x86_64")]
+        {
+            let expected = if is_x86_feature_detected!("avx2") {
+                "avx2"
+            } else if is_x86_feature_detected!("ssse3") {
+                "ssse3"
+            } else {
+                "sse2"
+            };
+            assert_eq!(name, expected);
+        }
+        #[cfg(not(target_arch = "x86_64"))]
+        assert_eq!(name, "swar");
+    }
+
+    #[test]
+    fn test_find_swar_near_misses() {
+        // Bytes one off from a special character must not borrow into a hit.
+        assert_eq!(find_swar::<true>(b"%%;;==??!!##(("), None);
+        assert_eq!(find_swar::<true>(b"%%;;==??!!##((''"), Some(14));
+        assert_eq!(
+            find_swar::<true>(&[0u8, 1, 0x25, 0x27, 0x3b, 0x3d, 0x3f, 0xa6]),
+            Some(3)
+        );
+    }
+
+    #[test]
+    fn test_find_first_of_many() {
+        assert_eq!(find::<true>(b"0123456789abcdef0123<5>789"), Some(20));
+        assert_eq!(find::<true>("日本語日本語日本語<".as_bytes()), Some(27));
+        assert_eq!(find::<false>(b"0123456789abcdef0123>5>789<"), Some(26));
+    }
+}
@@ -1,5 +1,6 @@
 use proptest::prelude::*;
-use rysafe_core::{escape, escape_silent};
+use rysafe_core::{escape, escape_bytes, escape_into, escape_silent, needs_escaping};
+use std::borrow::Cow;
 
 #[test]
 fn test_empty_string() {
@@ -56,6 +57,37 @@ fn test_attribute_injection() {
     assert_eq!(escape(input), expected);
 }
 
+#[test]
+fn test_large_input_without_specials_is_borrowed() {
+    let big = "a".repeat(100_000);
+    assert!(matches!(escape(&big), Cow::Borrowed(s) if std::ptr::eq(s, big.as_str())));
+
+    let mixed = "Lorem ipsum 日本語 🔥 ".repeat(5_000);
+    assert!(matches!(escape(&mixed), Cow::Borrowed(_)));
+    assert!(matches!(escape_bytes(mixed.as_bytes()), Cow::Borrowed(_)));
+}
+
+#[test]
+fn test_single_special_at_block_edges_of_large_input() {
+    for len in [1 << 20, (1 << 20) + 7, (1 << 20) + 31] {
+        let head = 0..64;
+        let tail = len - 64..len;
+        for pos in head.chain(tail) {
+            let mut buf = vec![b'a'; len];
+            buf[pos] = b'<';
+            let escaped = escape_bytes(&buf);
+            assert_eq!(escaped.len(), len + 3, "len {} pos {}", len, pos);
+            assert_eq!(&escaped[pos..pos + 4], b"&lt;", "len {} pos {}", len, pos);
+        }
+    }
+}
+
+#[test]
+fn test_escape_bytes_matches_escape() {
+    let input = "日本語<test>&\"'🔥";
+    assert_eq!(escape_bytes(input.as_bytes()), escape(input).as_bytes());
+}
+
 proptest! {
     #[test]
     fn test_escape_idempotent(s: String) {
@@ -84,4 +116,22 @@ proptest! {
         prop_assert!(!escaped.contains('"') || s.contains('"'));
         prop_assert!(!escaped.contains('\'') || s.contains('\''));
     }
+
+    #[test]
+    fn test_escape_bytes_consistent(s: String) {
+        let escaped = escape(&s);
+        prop_assert_eq!(escape_bytes(s.as_bytes()).as_ref(), escaped.as_bytes());
+    }
+
+    #[test]
+    fn test_needs_escaping_matches_escape(s: String) {
+        prop_assert_eq!(needs_escaping(&s), escape(&s) != s);
+    }
+
+    #[test]
+    fn test_escape_into_matches_escape(prefix: String, s: String) {
+        let mut out = prefix.clone();
+        escape_into(&s, &mut out);
+        prop_assert_eq!(out, prefix + &escape(&s));
+    }
 }
@@ -1,3 +1,5 @@
 pub mod core {
     pub use rysafe_core::*;
 }
+
+mod python;
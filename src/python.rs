@@ -0,0 +1,305 @@
+use std::borrow::Cow;
+use std::cell::RefCell;
+
+use pyo3::exceptions::PyUnicodeEncodeError;
+use pyo3::ffi;
+use pyo3::prelude::*;
+use pyo3::types::{PyByteArray, PyBytes, PyDict, PyString};
+
+/// Scratch buffers larger than this are released after use instead of being
+/// kept for the lifetime of the thread.
+const SCRATCH_MAX: usize = 64 * 1024;
+
+/// For inputs longer than this, the escape scan and write run with the GIL
+/// released. Reading the input's UTF-8 form (`to_cow`) still happens before
+/// that, with the GIL held.
+const ALLOW_THREADS_MIN: usize = 4 * 1024;
+
+/// Batches with fewer characters than this in total are escaped on the
+/// calling thread; below it, spawning workers costs more than it saves.
+const PARALLEL_MIN: usize = 256 * 1024;
+
+thread_local! {
+    static SCRATCH: RefCell<String> = const { RefCell::new(String::new()) };
+}
+
+/// Escape `&`, `<`, `>`, `"` and `'` in `s`.
+///
+/// When nothing needs escaping the argument itself is returned rather than
+/// an equal copy. Strings holding lone surrogates, as produced by the
+/// `surrogateescape` error handler, are escaped with the surrogates kept.
+///
+/// With `strict_gt=False`, `>` is left as is; that is safe in text content
+/// and quoted attribute values, and makes tag-heavy input faster to scan.
+#[pyfunction]
+#[pyo3(signature = (s, strict_gt = true))]
+fn escape<'py>(s: &Bound<'py, PyString>, strict_gt: bool) -> PyResult<Bound<'py, PyString>> {
+    let text = match s.to_cow() {
+        Ok(text) => text,
+        Err(err) if err.is_instance_of::<PyUnicodeEncodeError>(s.py()) => {
+            return escape_surrogates(s, strict_gt);
+        }
+        Err(err) => return Err(err),
+    };
+    // One pass both decides whether anything changes and writes the result
+    // into the reused scratch buffer, so no intermediate `String` is built.
+    // Under the abi3 limited API `to_cow` above still copies the input into
+    // a fresh UTF-8 buffer on every call; that copy is not avoidable before
+    // Python 3.10.
+    let py = s.py();
+    let escaped = with_escaped(py, &text, strict_gt, |escaped| {
+        escaped.map(|escaped| PyString::new_bound(py, escaped))
+    });
+    Ok(escaped.unwrap_or_else(|| s.clone()))
+}
+
+/// Escape a `str` that has no UTF-8 form because it holds lone surrogates.
+///
+/// The string round-trips through `surrogatepass` bytes. Every escaped
+/// character is ASCII, so the encoded surrogates pass through untouched.
+fn escape_surrogates<'py>(
+    s: &Bound<'py, PyString>,
+    strict_gt: bool,
+) -> PyResult<Bound<'py, PyString>> {
+    let py = s.py();
+    // Encode through the C API rather than `s.encode()`, so an `encode`
+    // override on a `str` subclass cannot change what gets escaped.
+    // SAFETY: `s` is a live str; the call returns a new reference, or NULL
+    // with an exception set.
+    let encoded = unsafe {
+        Bound::from_owned_ptr_or_err(
+            py,
+            ffi::PyUnicode_AsEncodedString(
+                s.as_ptr(),
+                c"utf-8".as_ptr(),
+                c"surrogatepass".as_ptr(),
+            ),
+        )?
+    };
+    let encoded = encoded.downcast_into::<PyBytes>()?;
+    let bytes = encoded.as_bytes();
+    let escaped = if bytes.len() > ALLOW_THREADS_MIN {
+        py.allow_threads(|| rysafe_core::escape_bytes_with(bytes, strict_gt))
+    } else {
+        rysafe_core::escape_bytes_with(bytes, strict_gt)
+    };
+    match escaped {
+        Cow::Borrowed(_) => Ok(s.clone()),
+        // SAFETY: as above; `out` is valid for `out.len()` bytes.
+        Cow::Owned(out) => Ok(unsafe {
+            Bound::from_owned_ptr_or_err(
+                py,
+                ffi::PyUnicode_DecodeUTF8(
+                    out.as_ptr().cast(),
+                    out.len() as ffi::Py_ssize_t,
+                    c"surrogatepass".as_ptr(),
+                ),
+            )?
+        }
+        .downcast_into::<PyString>()?),
+    }
+}
+
+/// Escape `s` into `out`, replacing its contents with the UTF-8 result.
+///
+/// The result is written straight into `out`'s buffer, so a bytearray reused
+/// across calls is only resized, never replaced; `s` is still copied to UTF-8
+/// first under the abi3 limited API. Unlike `escape`, the GIL is held for the
+/// whole call: released, another thread could resize `out` mid-write. A `str`
+/// with lone surrogates has no UTF-8 form, so it raises `UnicodeEncodeError`
+/// here instead of being escaped.
+#[pyfunction]
+fn escape_into(s: &Bound<'_, PyString>, out: &Bound<'_, PyByteArray>) -> PyResult<()> {
+    let text = s.to_cow()?;
+    let bytes = text.as_bytes();
+
+    // Start with the same one-escape-per-five-bytes headroom as the core and
+    // double it whenever denser input runs out of room.
+    let mut size = bytes.len() + bytes.len() / 5 + 8;
+    let (mut read, mut written) = (0, 0);
+    while read < bytes.len() {
+        out.resize(size)?;
+        // SAFETY: no Python code runs while the slice is alive, so nothing
+        // can resize or free the bytearray's buffer under it.
+        let buf = unsafe { out.as_bytes_mut() };
+        let (r, w) = rysafe_core::escape_bytes_to_slice(&bytes[read..], &mut buf[written..]);
+        read += r;
+        written += w;
+        size *= 2;
+    }
+    out.resize(written)
+}
+
+/// Escape `text` into the per-thread scratch buffer and pass the result
+/// to `f`, or `None` if nothing needed escaping.
+///
+/// The buffer is reused across calls. For long inputs both the scan and the
+/// write run with the GIL released, since from there on it is pure Rust
+/// work; `f` runs after the GIL is back. `f` must not call back into Python
+/// code that could escape on this thread again.
+fn with_escaped<R>(
+    py: Python<'_>,
+    text: &str,
+    strict_gt: bool,
+    f: impl FnOnce(Option<&str>) -> R,
+) -> R {
+    SCRATCH.with(|scratch| {
+        let mut buf = scratch.borrow_mut();
+        buf.clear();
+        let escaped = if text.len() > ALLOW_THREADS_MIN {
+            let out: &mut String = &mut buf;
+            py.allow_threads(|| rysafe_core::escape_into_if_needed_with(text, out, strict_gt))
+        } else {
+            rysafe_core::escape_into_if_needed_with(text, &mut buf, strict_gt)
+        };
+        let result = f(escaped.then_some(buf.as_str()));
+        if buf.capacity() > SCRATCH_MAX {
+            *buf = String::new();
+        }
+        result
+    })
+}
+
+/// Escape `&`, `<`, `>`, `"` and `'` in `data` without decoding it.
+///
+/// Other bytes are copied through as they are, so UTF-8 input stays valid
+/// UTF-8. As with `escape`, the argument itself is returned when nothing
+/// needs escaping.
+#[pyfunction]
+fn escape_bytes<'py>(data: &Bound<'py, PyBytes>) -> Bound<'py, PyBytes> {
+    let bytes = data.as_bytes();
+    let escaped = if bytes.len() > ALLOW_THREADS_MIN {
+        data.py().allow_threads(|| rysafe_core::escape_bytes(bytes))
+    } else {
+        rysafe_core::escape_bytes(bytes)
+    };
+    match escaped {
+        Cow::Borrowed(_) => data.clone(),
+        Cow::Owned(out) => PyBytes::new_bound(data.py(), &out),
+    }
+}
+
+/// Like `escape`, but `None` becomes an empty string.
+#[pyfunction]
+#[pyo3(signature = (s))]
+fn escape_silent<'py>(
+    py: Python<'py>,
+    s: Option<&Bound<'py, PyString>>,
+) -> PyResult<Bound<'py, PyString>> {
+    match s {
+        Some(s) => escape(s, true),
+        // Cached per interpreter, so every call hands back the same object.
+        None => Ok(pyo3::intern!(py, "").clone()),
+    }
+}
+
+/// Escape every string in `items` in one call.
+///
+/// The batch costs a single crossing into Rust, and all items share the
+/// same scratch buffer as `escape`.
+#[pyfunction]
+fn escape_many<'py>(items: Vec<Bound<'py, PyString>>) -> PyResult<Vec<Bound<'py, PyString>>> {
+    items.iter().map(|s| escape(s, true)).collect()
+}
+
+/// Like `escape_many`, but large batches are split across threads.
+///
+/// The GIL is released while the workers run; strings that need no
+/// escaping are still returned as-is.
+#[pyfunction]
+fn escape_many_parallel<'py>(
+    py: Python<'py>,
+    items: Vec<Bound<'py, PyString>>,
+) -> PyResult<Vec<Bound<'py, PyString>>> {
+    // Size the batch from the string lengths alone: converting first would
+    // cost the small-batch path a second copy of every item.
+    let mut total = 0;
+    for s in &items {
+        total += s.len()?;
+    }
+    if total < PARALLEL_MIN {
+        return escape_many(items);
+    }
+
+    let texts: PyResult<Vec<_>> = items.iter().map(|s| s.to_cow()).collect();
+    let texts = match texts {
+        Ok(texts) => texts,
+        // Lone surrogates need the fallback in `escape`.
+        Err(err) if err.is_instance_of::<PyUnicodeEncodeError>(py) => return escape_many(items),
+        Err(err) => return Err(err),
+    };
+
+    let escaped = py.allow_threads(|| escape_all(&texts));
+    Ok(items
+        .into_iter()
+        .zip(escaped)
+        .map(|(s, e)| match e {
+            Some(e) => PyString::new_bound(py, &e),
+            None => s,
+        })
+        .collect())
+}
+
+/// Escape `texts` on scoped worker threads, one contiguous chunk each.
+///
+/// `None` marks a text that needed no escaping.
+fn escape_all(texts: &[Cow<'_, str>]) -> Vec<Option<String>> {
+    let workers = std::thread::available_parallelism().map_or(1, |n| n.get());
+    let chunk = texts.len().div_ceil(workers).max(1);
+    std::thread::scope(|scope| {
+        let handles: Vec<_> = texts
+            .chunks(chunk)
+            .map(|part| {
+                scope.spawn(move || {
+                    part.iter()
+                        .map(|t| match rysafe_core::escape(t) {
+                            Cow::Borrowed(_) => None,
+                            Cow::Owned(e) => Some(e),
+                        })
+                        .collect::<Vec<_>>()
+                })
+            })
+            .collect();
+        handles
+            .into_iter()
+            .flat_map(|h| h.join().expect("escape worker panicked"))
+            .collect()
+    })
+}
+
+/// Describe how this extension was compiled and what it runs on.
+///
+/// Lets tests and bug reports tell a debug build from a release one.
+/// `compile_time_features` are the SIMD features the whole build assumes;
+/// `scan_kernel` is the one picked at runtime for this CPU.
+#[pyfunction]
+#[pyo3(name = "__build_info__")]
+fn build_info(py: Python<'_>) -> PyResult<Bound<'_, PyDict>> {
+    let features: Vec<&str> = [
+        ("sse2", cfg!(target_feature = "sse2")),
+        ("ssse3", cfg!(target_feature = "ssse3")),
+        ("avx2", cfg!(target_feature = "avx2")),
+    ]
+    .into_iter()
+    .filter_map(|(name, enabled)| enabled.then_some(name))
+    .collect();
+
+    let info = PyDict::new_bound(py);
+    info.set_item("debug_assertions", cfg!(debug_assertions))?;
+    info.set_item("target_arch", std::env::consts::ARCH)?;
+    info.set_item("compile_time_features", features)?;
+    info.set_item("scan_kernel", rysafe_core::scan_kernel())?;
+    Ok(info)
+}
+
+#[pymodule]
+fn _rysafe_core(m: &Bound<'_, PyModule>) -> PyResult<()> {
+    m.add_function(wrap_pyfunction!(escape, m)?)?;
+    m.add_function(wrap_pyfunction!(escape_bytes, m)?)?;
+    m.add_function(wrap_pyfunction!(escape_into, m)?)?;
+    m.add_function(wrap_pyfunction!(escape_silent, m)?)?;
+    m.add_function(wrap_pyfunction!(escape_many, m)?)?;
+    m.add_function(wrap_pyfunction!(escape_many_parallel, m)?)?;
+    m.add_function(wrap_pyfunction!(build_info, m)?)?;
+    Ok(())
+}
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import html
+import platform
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import rysafe._rysafe_core
+from rysafe._rysafe_core import __build_info__
+from rysafe._rysafe_core import escape
+from rysafe._rysafe_core import escape_bytes
+from rysafe._rysafe_core import escape_into
+from rysafe._rysafe_core import escape_many
+from rysafe._rysafe_core import escape_many_parallel
+from rysafe._rysafe_core import escape_silent
+
+
+@pytest.mark.parametrize(
+    "value",
+    ("", "plain text", "こんにちは", "\U0001f363 xyz", "a" * 100_000),
+)
+def test_escape_returns_input_when_safe(value: str) -> None:
+    """Nothing to escape hands back the same object, no copy."""
+    assert escape(value) is value
+    assert escape_silent(value) is value
+    assert escape_many([value])[0] is value
+
+
+def test_escape_silent_none() -> None:
+    assert escape_silent(None) == ""
+    assert escape_silent(None) is escape_silent(None)
+
+
+@pytest.mark.parametrize("value", ("a > b", ">" * 100_000))
+def test_escape_without_gt_returns_input_when_safe(value: str) -> None:
+    assert escape(value, strict_gt=False) is value
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    (
+        ("<a href='x'>b</a>", "&lt;a href=&#39;x&#39;>b&lt;/a>"),
+        ("a -> b & c", "a -> b &amp; c"),
+        ("<" * 10_000 + ">", "&lt;" * 10_000 + ">"),
+        ("\udcff<>", "\udcff&lt;>"),
+    ),
+)
+def test_escape_without_gt(value: str, expected: str) -> None:
+    assert escape(value, strict_gt=False) == expected
+    assert escape(value, strict_gt=True) == escape(value)
+    assert "&gt;" in escape(value)
+
+
+def test_escape_copies_when_needed() -> None:
+    value = "a < b"
+    result = escape(value)
+    assert result is not value
+    assert result == "a &lt; b"
+
+
+def test_escape_into_reuses_buffer() -> None:
+    buf = bytearray(b"stale contents that are longer than the results")
+    for value in ("a < b", "", "こんにちは&", "plain", "<" * 10_000, "&" * 10_000):
+        escape_into(value, buf)
+        assert buf == escape(value).encode()
+
+
+def test_escape_into_exported_buffer() -> None:
+    buf = bytearray()
+    with memoryview(buf):
+        with pytest.raises(BufferError):
+            escape_into("<x>", buf)
+
+
+def test_escape_large_from_threads() -> None:
+    """Large inputs are escaped without the GIL; results must not mix."""
+    values = [f"<{i}>" + "a & b " * 50_000 for i in range(32)]
+    expected = [html.escape(v) for v in values]
+    with ThreadPoolExecutor(8) as pool:
+        assert list(pool.map(escape, values)) == expected
+
+
+def test_escape_large_safe_from_threads() -> None:
+    """Clean and late-hit inputs are scanned without the GIL as well."""
+    values = ["a" * 1_000_000 + str(i) for i in range(16)]
+    values += ["a" * 1_000_000 + f"<{i}>" for i in range(16)]
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(escape, values))
+    assert all(r is v for r, v in zip(results[:16], values))
+    assert results[16:] == [html.escape(v) for v in values[16:]]
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    (
+        (b"<x>", b"&lt;x&gt;"),
+        (b"a & 'b' \"c\"", b"a &amp; &#39;b&#39; &#34;c&#34;"),
+        ("<こんにちは>".encode(), "&lt;こんにちは&gt;".encode()),
+        (b"\xff<\x00", b"\xff&lt;\x00"),
+        (b"<" * 10_000, b"&lt;" * 10_000),
+    ),
+)
+def test_escape_bytes(value: bytes, expected: bytes) -> None:
+    assert escape_bytes(value) == expected
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    (
+        ("\udcff<", "\udcff&lt;"),
+        ("a\ud800 & \udfff", "a\ud800 &amp; \udfff"),
+        ("<" + "\udc80" * 10_000, "&lt;" + "\udc80" * 10_000),
+    ),
+)
+def test_escape_lone_surrogates(value: str, expected: str) -> None:
+    assert escape(value) == expected
+    assert escape_many([value]) == [expected]
+
+
+def test_escape_lone_surrogates_returns_input_when_safe() -> None:
+    value = b"caf\xe9".decode("utf-8", "surrogateescape")
+    assert escape(value) is value
+
+
+def test_escape_lone_surrogates_ignores_encode_override() -> None:
+    class Sneaky(str):
+        def encode(self, *args: object, **kwargs: object) -> bytes:
+            return b"<changed>"
+
+    assert escape(Sneaky("\udcff<")) == "\udcff&lt;"
+
+
+def test_escape_into_rejects_lone_surrogates() -> None:
+    with pytest.raises(UnicodeEncodeError):
+        escape_into("\udcff<", bytearray())
+
+
+@pytest.mark.parametrize("value", (b"", b"plain", b"\xff\xfe", b"a" * 100_000))
+def test_escape_bytes_returns_input_when_safe(value: bytes) -> None:
+    assert escape_bytes(value) is value
+
+
+def test_escape_bytes_rejects_str() -> None:
+    with pytest.raises(TypeError):
+        escape_bytes("<x>")  # type: ignore[arg-type]
+
+
+@pytest.mark.parametrize(
+    "items",
+    (
+        [],
+        [""],
+        ["plain", "<a href='x'>", "こんにちは&", "\U0001f363\"\U0001f37a"],
+        ["<b>"] * 1000,
+    ),
+)
+def test_escape_many(items: list[str]) -> None:
+    assert escape_many(items) == [escape(s) for s in items]
+
+
+@pytest.mark.parametrize("size", (1, 100))
+def test_escape_many_parallel(size: int) -> None:
+    items = [f"<{i}> & " * size if i % 3 else "x" * size for i in range(10_000)]
+    result = escape_many_parallel(items)
+    assert result == escape_many(items)
+    assert all(r is s for r, s in zip(result, items) if "<" not in s)
+
+
+def test_escape_many_parallel_lone_surrogates() -> None:
+    items = ["<a>" * 100] * 10_000 + ["\udcff<"]
+    assert escape_many_parallel(items) == escape_many(items)
+
+
+def test_escape_many_rejects_non_str() -> None:
+    with pytest.raises(TypeError):
+        escape_many(["ok", 1])  # type: ignore[list-item]
+
+
+def test_build_info() -> None:
+    info = __build_info__()
+    arch = info["target_arch"]
+    assert isinstance(arch, str) and arch
+    assert isinstance(info["debug_assertions"], bool)
+    # Rust's arch names differ from platform.machine() in general; only the
+    # 64-bit x86 case is pinned, where both are known.
+    if platform.machine().lower() in ("x86_64", "amd64") and sys.maxsize > 2**32:
+        assert arch == "x86_64"
+    if arch == "x86_64":
+        assert "sse2" in info["compile_time_features"]
+        assert info["scan_kernel"] in ("avx2", "ssse3", "sse2")
+    else:
+        assert info["scan_kernel"] == "swar"
+
+
+@pytest.mark.skipif(
+    sys.implementation.name != "cpython", reason="abi3 is CPython-only"
+)
+@pytest.mark.skipif(
+    sys.platform == "win32", reason="abi3 modules on Windows are plain .pyd"
+)
+def test_extension_uses_stable_abi() -> None:
+    """One wheel per platform; no per-version rebuilds."""
+    assert ".abi3." in rysafe._rysafe_core.__file__